@@ -1,8 +1,171 @@
 import ctypes
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from ctypes import wintypes
-from models import FileExtent
+from typing import Optional
+from destination import DestinationFile
+from models import FileExtent, Overlapped
 from ntfs import NTFSDisk
-from shims import CloseHandle, CreateFile
+from shims import CloseHandle, CreateEvent, CreateFile, GetFileSizeEx, INVALID_HANDLE_VALUE
+
+# Size of a single read from the disk, in bytes
+READ_CHUNK_BYTES: int = 2 << 20
+
+# Number of reads kept in flight against the disk at once, per worker
+QUEUE_DEPTH: int = 4
+
+# Number of threads copying at once, each with its own disk and destination handles
+WORKERS: int = 4
+
+# A chunk to copy, as the starting cluster, the number of clusters and the byte offset in the destination
+Chunk = tuple[int, int, int]
+
+
+def _iter_chunks(
+    extents: Iterable[FileExtent], chunk_clusters: int, cluster_size: int, total_clusters: int
+) -> Iterator[Chunk]:
+    """
+    Split extents into reads of at most chunk_clusters clusters each.
+
+    Clusters past total_clusters are allocated to the file but hold no data, so they are left out.
+
+    :param Iterable[FileExtent] extents: The extents to split, in file order.
+    :param int chunk_clusters: The maximum number of clusters in a single read.
+    :param int cluster_size: The size of a cluster in bytes.
+    :param int total_clusters: The number of clusters the data of the file takes up.
+    :return: Tuples of the starting cluster, the number of clusters to read and where they go in the destination.
+    :rtype: Iterator[Chunk]
+    """
+    destination_offset: int = 0
+    remaining: int = total_clusters
+
+    for extent in extents:
+        size: int = min(extent.size, remaining)
+
+        for offset in range(0, size, chunk_clusters):
+            clusters: int = min(chunk_clusters, size - offset)
+
+            yield extent.lcn + offset, clusters, destination_offset
+            destination_offset += clusters * cluster_size
+
+        remaining -= size
+
+        if not remaining:
+            break
+
+
+def _copy_chunks(
+    drive_letter: str,
+    destination_file: str,
+    unbuffered: bool,
+    chunk_clusters: int,
+    next_chunk: Callable[[], Optional[Chunk]],
+) -> tuple[int, int]:
+    """
+    Copy chunks from the disk to the destination until there are none left.
+
+    The disk and the destination are opened with handles of their own, so several of these can run at
+    once from different threads as long as they are given different chunks.
+
+    :param str drive_letter: The drive letter of the disk to read from.
+    :param str destination_file: The path of the destination, which must already exist.
+    :param bool unbuffered: Whether to write to the destination without buffering.
+    :param int chunk_clusters: The maximum number of clusters in a single chunk, which sizes the buffers.
+    :param Callable[[], Optional[Chunk]] next_chunk: Returns the next chunk to copy, or None when there are none left.
+    :return: The number of clusters submitted for reading and the number of clusters written.
+    :rtype: tuple[int, int]
+    """
+    submitted_clusters: int = 0
+    copied_clusters: int = 0
+
+    with NTFSDisk(drive_letter=drive_letter) as disk, DestinationFile(
+        destination_file, create=False, unbuffered=unbuffered
+    ) as destination:
+        # The cluster size is fixed for the whole copy, so look it up once rather than for every chunk
+        cluster_size: int = disk.cluster_size
+
+        # Each slot owns a buffer and an OVERLAPPED structure, which are used to read a chunk from the disk
+        # and then to write the same buffer to the destination, so the data is never copied in Python.
+        # Queued chunks carry their length in bytes, worked out once when the read is started.
+        chunk_bytes: int = chunk_clusters * cluster_size
+        slots: list[tuple[ctypes.Array[ctypes.c_char], Overlapped]] = []
+        free: deque[tuple[ctypes.Array[ctypes.c_char], Overlapped]] = deque()
+        reading: deque[tuple[ctypes.Array[ctypes.c_char], Overlapped, int, int, int]] = deque()
+        writing: deque[tuple[ctypes.Array[ctypes.c_char], Overlapped, int, int]] = deque()
+
+        try:
+            for _ in range(QUEUE_DEPTH):
+                event: wintypes.HANDLE = CreateEvent(None, True, False, None)
+
+                if not event:
+                    raise ctypes.WinError(ctypes.get_last_error())
+
+                try:
+                    # Buffers need to be aligned as the disk is read without buffering
+                    slots.append((disk.allocate_buffer(chunk_bytes), Overlapped(hEvent=event)))
+                except OSError:
+                    CloseHandle(event)
+                    raise
+
+                free.append(slots[-1])
+
+            while True:
+                # Start a read for every free slot
+                while free:
+                    chunk: Optional[Chunk] = next_chunk()
+
+                    if chunk is None:
+                        break
+
+                    cluster, clusters, destination_offset = chunk
+                    buffer, overlapped = free.popleft()
+                    disk.submit_read(buffer, overlapped, cluster, clusters)
+                    reading.append((buffer, overlapped, clusters, clusters * cluster_size, destination_offset))
+                    submitted_clusters += clusters
+
+                if not reading and not writing:
+                    break
+
+                # Reap reads in the order they were submitted and write each one to where it goes
+                if reading:
+                    buffer, overlapped, clusters, length, destination_offset = reading[0]
+                    bytes_read: int = disk.wait_read(overlapped)
+                    reading.popleft()
+
+                    if bytes_read != length:
+                        raise ValueError(f"Expected {length} bytes, but got {bytes_read} bytes")
+
+                    destination.submit_write(buffer, overlapped, destination_offset, length)
+                    writing.append((buffer, overlapped, clusters, length))
+
+                # Hand back slots whose writes have already finished, so the reads that follow, including the
+                # start of the next extent, are queued before we block again. Only wait for the oldest write
+                # when every slot is busy, or when only writes are left.
+                while writing and (writing[0][1].completed or not free or not reading):
+                    buffer, overlapped, clusters, length = writing[0]
+                    bytes_written: int = destination.wait_write(overlapped)
+                    writing.popleft()
+
+                    if bytes_written != length:
+                        raise ValueError(f"Expected {length} bytes written, but wrote {bytes_written} bytes")
+
+                    free.append((buffer, overlapped))
+                    copied_clusters += clusters
+        finally:
+            # Make sure the disk and the destination are done with every buffer before they are freed
+            for _, overlapped, _, _, _ in reading:
+                disk.cancel_read(overlapped)
+
+            for _, overlapped, _, _ in writing:
+                destination.cancel_write(overlapped)
+
+            for buffer, overlapped in slots:
+                CloseHandle(overlapped.hEvent)
+                disk.free_buffer(buffer)
+
+    return submitted_clusters, copied_clusters
 
 
 def copy_file(source_file: str, destination_file: str) -> None:
@@ -25,29 +188,68 @@ def copy_file(source_file: str, destination_file: str) -> None:
         None,
     )
 
-    if handle == -1:
+    if handle == INVALID_HANDLE_VALUE:
         raise ctypes.WinError(ctypes.get_last_error())
 
-    drive_letter = source_file[0]
-
-    with NTFSDisk(drive_letter=drive_letter) as disk:
-        extents: list[FileExtent] = disk.get_retrieval_pointers(handle)
-        total_size: int = sum(extent.size for extent in extents)
-        copied_bytes: int = 0
-
-        with open(destination_file, "wb") as dest_file:
-            for extent in extents:
-                for offset in range(0, extent.size, 10000):
-                    current_size = min(10000, extent.size - offset)
-                    data: bytes = disk.read_clusters(
-                        extent.lcn + offset,
-                        current_size,
-                    )
-                    dest_file.write(data)
-                    copied_bytes += current_size
-
-    if not CloseHandle(handle):
+    # Everything from here on can fail, so make sure the source handle is closed either way
+    try:
+        drive_letter = source_file[0]
+
+        # Get the size of the source file, the copy is made in whole clusters
+        file_size: wintypes.LARGE_INTEGER = wintypes.LARGE_INTEGER()
+
+        if not GetFileSizeEx(handle, ctypes.byref(file_size)):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+        with NTFSDisk(drive_letter=drive_letter) as disk:
+            total_clusters: int = -(-file_size.value // disk.cluster_size)
+
+            # Writes are whole clusters of the source, so they can only skip the cache of the destination
+            # when its sectors divide the cluster size. Otherwise write through a buffered handle.
+            unbuffered: bool = disk.cluster_size % DestinationFile.get_sector_size(destination_file) == 0
+
+            # Create the destination at its full size up front, so NTFS can allocate it in as few runs as
+            # possible. The workers then open it again with handles of their own.
+            with DestinationFile(destination_file, unbuffered=unbuffered) as destination:
+                destination.set_size(total_clusters * disk.cluster_size)
+
+            # Extents are fetched lazily, so reads of the first ones start before the rest are known.
+            # The workers share the chunks, so taking the next one is done under a lock.
+            chunk_clusters: int = max(1, READ_CHUNK_BYTES // disk.cluster_size)
+            chunks: Iterator[Chunk] = _iter_chunks(
+                disk.get_retrieval_pointers_iter(handle), chunk_clusters, disk.cluster_size, total_clusters
+            )
+            lock: threading.Lock = threading.Lock()
+            failed: threading.Event = threading.Event()
+
+            def next_chunk() -> Optional[Chunk]:
+                with lock:
+                    # Stop handing out chunks once any worker has failed
+                    return None if failed.is_set() else next(chunks, None)
+
+            def run_worker() -> tuple[int, int]:
+                try:
+                    return _copy_chunks(drive_letter, destination_file, unbuffered, chunk_clusters, next_chunk)
+                except BaseException:
+                    failed.set()
+                    raise
+
+            with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+                futures: list[Future[tuple[int, int]]] = [executor.submit(run_worker) for _ in range(WORKERS)]
+                results: list[tuple[int, int]] = [future.result() for future in futures]
+
+        submitted_clusters: int = sum(submitted for submitted, _ in results)
+        copied_clusters: int = sum(copied for _, copied in results)
+
+        # The workers write whole clusters, so cut the destination back to the size of the source.
+        # That size need not be sector aligned, which only a buffered handle can set.
+        with DestinationFile(destination_file, create=False, unbuffered=False) as destination:
+            destination.set_size(file_size.value)
+    finally:
+        closed: bool = CloseHandle(handle)
+
+    if not closed:
         raise ctypes.WinError(ctypes.get_last_error())
 
-    if copied_bytes != total_size:
-        raise ValueError("Not all bytes were copied.")
+    if copied_clusters != submitted_clusters or copied_clusters != total_clusters:
+        raise ValueError("Not all clusters were copied.")
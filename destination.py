@@ -0,0 +1,176 @@
+import ctypes
+from ctypes import wintypes
+
+from shims import (
+    CreateFile,
+    INVALID_HANDLE_VALUE,
+    CloseHandle,
+    WriteFile,
+    SetFilePointerEx,
+    SetEndOfFile,
+)
+from models import Overlapped
+from overlapped import OverlappedHandle
+from volume import get_cluster_geometry, get_volume_root
+
+
+class DestinationFile(OverlappedHandle):
+    def __init__(self, file_path: str, create: bool = True, unbuffered: bool = True):
+        super().__init__()
+
+        # Path of the file to write to
+        self.file_path: str = file_path
+
+        # Whether to create the file, or open one that already exists
+        self.create: bool = create
+
+        # Whether writes bypass the cache manager, see _initialise_file
+        self.unbuffered: bool = unbuffered
+
+        # Win32 handle to the file
+        self.handle: wintypes.HANDLE
+
+        # Open the file
+        self._initialise_file()
+
+    def __enter__(self) -> "DestinationFile":
+        """
+        Enter the context manager.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Exit the context manager.
+        Close the file handle.
+        """
+        handle: wintypes.HANDLE = self.handle
+
+        if handle:
+            # Set the handle to None to avoid double closing
+            self.handle = None
+
+            if not CloseHandle(handle):
+                raise ctypes.WinError(ctypes.get_last_error())
+
+    @staticmethod
+    def get_sector_size(file_path: str) -> int:
+        """
+        Get the sector size of the volume a file is on.
+
+        Unbuffered writes must start at offsets and have lengths that are a multiple of this.
+
+        :param str file_path: The path of the file, which does not need to exist yet.
+        :return: The sector size in bytes.
+        :rtype: int
+        :raises ctypes.WinError: If the sector size cannot be obtained.
+        """
+        # Look up the root rather than taking the drive, as the file may be on a volume mounted in a folder
+        _, bytes_per_sector = get_cluster_geometry(get_volume_root(file_path))
+
+        return bytes_per_sector
+
+    def _initialise_file(self) -> None:
+        """
+        Open the file for writing. It is created, replacing any existing file, unless create is False,
+        in which case it must already exist.
+
+        The file is opened for overlapped I/O so that writes can be in flight while the next reads run.
+        Other handles may write to the same file at the same time, as long as they write disjoint ranges.
+
+        Unless unbuffered is False, the file is also opened without buffering and with write through, so
+        writes go straight to the disk instead of through the cache manager. This needs aligned buffers,
+        such as those from NTFSDisk.allocate_buffer, and offsets and lengths that are a multiple of the
+        sector size. Setting a size that is not a multiple of the sector size needs a buffered handle.
+        """
+        ACCESS_WRITE: int = 0x40000000
+        SHARE_RW: int = 0x00000001 | 0x00000002
+        MODE_CREATE_ALWAYS: int = 0x00000002
+        MODE_OPEN: int = 0x00000003
+        ATTR_NORMAL: int = 0x80
+        FILE_FLAG_OVERLAPPED: int = 0x40000000
+        FILE_FLAG_NO_BUFFERING: int = 0x20000000
+        FILE_FLAG_WRITE_THROUGH: int = 0x80000000
+        flags: int = ATTR_NORMAL | FILE_FLAG_OVERLAPPED
+
+        if self.unbuffered:
+            flags |= FILE_FLAG_NO_BUFFERING | FILE_FLAG_WRITE_THROUGH
+
+        # Open the file
+        handle: wintypes.HANDLE = CreateFile(
+            self.file_path,
+            ACCESS_WRITE,
+            SHARE_RW,
+            None,
+            MODE_CREATE_ALWAYS if self.create else MODE_OPEN,
+            flags,
+            None,
+        )
+
+        # Check if the handle is valid and raise an error if not
+        if handle == INVALID_HANDLE_VALUE:
+            raise ctypes.WinError(ctypes.get_last_error())
+
+        self.handle = handle
+
+    def set_size(self, size: int) -> None:
+        """
+        Set the size of the file, extending or truncating it.
+
+        Extending the file before writing to it lets NTFS allocate it in as few runs as possible,
+        rather than growing it a write at a time.
+
+        :param int size: The new size of the file in bytes.
+        :raises ctypes.WinError: If the size cannot be set.
+        """
+        FILE_BEGIN: int = 0
+
+        # Move the file pointer to the new end of the file and set the end of the file there.
+        # Writes are positioned by their OVERLAPPED structure, so the pointer does not need to be moved back.
+        if not SetFilePointerEx(self.handle, size, None, FILE_BEGIN):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+        if not SetEndOfFile(self.handle):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def submit_write(self, buffer: ctypes.Array, overlapped: Overlapped, offset: int, length: int) -> None:
+        """
+        Start an overlapped write of a caller supplied buffer to the file.
+
+        The write is positioned by the offset in the OVERLAPPED structure, so no seek is needed.
+        Neither the buffer nor the OVERLAPPED structure may be reused until wait_write or cancel_write
+        has been called for it.
+
+        :param ctypes.Array buffer: A ctypes char array holding the data to write.
+        :param Overlapped overlapped: The OVERLAPPED structure to track the write with.
+        :param int offset: The byte offset in the file to write at.
+        :param int length: The number of bytes from the start of the buffer to write.
+        :raises ValueError: If the buffer is smaller than the length.
+        :raises ctypes.WinError: If the write could not be started.
+        """
+        if len(buffer) < length:
+            raise ValueError("Buffer is smaller than the length to write")
+
+        self._submit(WriteFile, buffer, overlapped, offset, length)
+
+    def wait_write(self, overlapped: Overlapped) -> int:
+        """
+        Wait for a write started with submit_write to complete.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the write was started with.
+        :return: The number of bytes written.
+        :rtype: int
+        :raises ctypes.WinError: If the write operation fails.
+        """
+        return self._wait(overlapped)
+
+    def cancel_write(self, overlapped: Overlapped) -> None:
+        """
+        Cancel a write started with submit_write and wait for it to finish.
+
+        Once this returns the buffer and the OVERLAPPED structure are safe to reuse or free.
+        Any error from the cancelled write is ignored.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the write was started with.
+        """
+        self._cancel(overlapped)
@@ -1,6 +1,6 @@
 import ctypes
 from ctypes import wintypes
-from dataclasses import dataclass
+from typing import NamedTuple
 
 
 # DISK_GEOMETRY - https://learn.microsoft.com/en-us/windows/win32/api/winioctl/ns-winioctl-disk_geometry
@@ -45,8 +45,43 @@ class RetrievalPointersBuffer(ctypes.Structure):
     ]
 
 
-@dataclass
-class FileExtent:
+# OVERLAPPED - https://learn.microsoft.com/en-us/windows/win32/api/minwinbase/ns-minwinbase-overlapped
+class Overlapped(ctypes.Structure):
+    _fields_ = [
+        ("Internal", ctypes.c_size_t),
+        ("InternalHigh", ctypes.c_size_t),
+        ("Offset", wintypes.DWORD),
+        ("OffsetHigh", wintypes.DWORD),
+        ("hEvent", wintypes.HANDLE),
+    ]
+
+    @property
+    def completed(self) -> bool:
+        """
+        Whether the request has completed, the same check as the HasOverlappedIoCompleted macro.
+        """
+        STATUS_PENDING: int = 0x00000103
+
+        return self.Internal != STATUS_PENDING
+
+    @property
+    def offset(self) -> int:
+        """
+        The 64-bit byte offset of the request, combined from Offset and OffsetHigh.
+        """
+        return self.Offset | (self.OffsetHigh << 32)
+
+    @offset.setter
+    def offset(self, value: int) -> None:
+        if value < 0 or value >> 64:
+            raise ValueError("Offset must fit in an unsigned 64-bit integer")
+
+        self.Offset = value & 0xFFFFFFFF
+        self.OffsetHigh = value >> 32
+
+
+# A run of a file on disk, all values are in clusters
+class FileExtent(NamedTuple):
     vcn: int
     lcn: int
     size: int
@@ -1,23 +1,39 @@
 import ctypes
 from ctypes import wintypes
-from typing import Any
-
-from shims import CreateFile, GetFreeDiskSpace, DeviceIoControl, CloseHandle, SetFilePointer, ReadFile
+from collections.abc import Iterator
+
+from shims import (
+    CreateFile,
+    INVALID_HANDLE_VALUE,
+    DeviceIoControl,
+    CloseHandle,
+    ReadFile,
+    VirtualAlloc,
+    VirtualFree,
+)
 from models import (
     DiskGeometry,
     GetLengthInformation,
+    Overlapped,
     RetrievalPointerExtent,
     RetrievalPointersBuffer,
     StartingVcnInputBuffer,
     FileExtent,
 )
+from overlapped import OverlappedHandle
+from volume import get_cluster_geometry
 
 
-class NTFSDisk:
+class NTFSDisk(OverlappedHandle):
     def __init__(self, drive_letter: str):
+        super().__init__()
+
         # DOS device name for the disk
         self.disk_path: str = f"\\\.\{drive_letter}:"
 
+        # Root directory of the volume, which GetDiskFreeSpace needs rather than the device name
+        self.root_path: str = f"{drive_letter}:\\"
+
         # Win32 handle to the disk
         self.handle: wintypes.HANDLE
 
@@ -25,28 +41,32 @@ class NTFSDisk:
         self.size_bytes: int
         self.cluster_size: int
         self.sector_size: int
-        self.sectors_per_cluster: int
-
-        # FS information, can get calculated from the above
-        self.cluster_count: int = self.size_bytes // self.cluster_size
-        self.sector_count: int = self.size_bytes // self.sector_size
 
-        # Current position in the stream
-        self.current_position: int = 0
+        # FS information, gets calculated from the above
+        self.cluster_count: int
 
         # Open the disk
         self._initialise_disk()
 
-        # Get disk geometry
-        self._get_disk_geometry()
+        # The context manager is not entered yet, so close the handle here if anything below fails
+        try:
+            # Get disk geometry
+            self._get_disk_geometry()
 
-        # Get disk length
-        self._get_disk_length()
+            # Get disk length
+            self._get_disk_length()
 
-        # Get cluster count
-        self._get_cluster_count()
+            # Get cluster count
+            self._get_cluster_count()
 
-    def __enter__(self) -> None:
+            # Calculate the cluster count now that the sizes are known
+            self.cluster_count = self.size_bytes // self.cluster_size
+        except BaseException:
+            CloseHandle(self.handle)
+            self.handle = None
+            raise
+
+    def __enter__(self) -> "NTFSDisk":
         """
         Enter the context manager.
         """
@@ -57,28 +77,44 @@ class NTFSDisk:
         Exit the context manager.
         Close the disk handle.
         """
-        if self.handle:
+        handle: wintypes.HANDLE = self.handle
+
+        if handle:
             # Set the handle to None to avoid double closing
             self.handle = None
 
-            if not CloseHandle(self.handle):
+            if not CloseHandle(handle):
                 raise ctypes.WinError(ctypes.get_last_error())
 
     def _initialise_disk(self) -> None:
         """
         Open the disk for reading.
         The disk path is in the format \\.\X: where X is the drive letter.
+
+        The disk is opened for overlapped I/O so that several reads can be in flight at once.
+        It is also opened without buffering, so reads bypass the cache manager. This needs buffers
+        allocated with allocate_buffer, and offsets and lengths that are a multiple of the sector size.
         """
         ACCESS_READ: int = 0x80000000
         SHARE_RW: int = 0x00000001 | 0x00000002
         MODE_OPEN: int = 0x00000003
-        ATTR_NORMAL: int = 0x80
+        FILE_FLAG_OVERLAPPED: int = 0x40000000
+        FILE_FLAG_NO_BUFFERING: int = 0x20000000
+        FILE_FLAG_SEQUENTIAL_SCAN: int = 0x08000000
 
         # Open the disk
-        handle: wintypes.HANDLE = CreateFile(self.disk_path, ACCESS_READ, SHARE_RW, None, MODE_OPEN, ATTR_NORMAL, None)
+        handle: wintypes.HANDLE = CreateFile(
+            self.disk_path,
+            ACCESS_READ,
+            SHARE_RW,
+            None,
+            MODE_OPEN,
+            FILE_FLAG_OVERLAPPED | FILE_FLAG_NO_BUFFERING | FILE_FLAG_SEQUENTIAL_SCAN,
+            None,
+        )
 
         # Check if the handle is valid and raise an error if not
-        if handle == -1:
+        if handle == INVALID_HANDLE_VALUE:
             raise ctypes.WinError(ctypes.get_last_error())
 
         self.handle = handle
@@ -138,141 +174,258 @@ class NTFSDisk:
 
         The cluster count is used to calculate the size of the disk and the number of sectors.
         """
-        sectors_per_cluster: wintypes.DWORD = wintypes.DWORD()
-        bytes_per_sector: wintypes.DWORD = wintypes.DWORD()
+        sectors_per_cluster, bytes_per_sector = get_cluster_geometry(self.root_path)
 
-        # Get the cluster size and raise an error if it fails
-        if not GetFreeDiskSpace(
-            self.disk_path,
-            ctypes.byref(sectors_per_cluster),
-            ctypes.byref(bytes_per_sector),
-            wintypes.DWORD(),
-            wintypes.DWORD(),
-        ):
+        self.cluster_size = bytes_per_sector * sectors_per_cluster
+
+    def allocate_buffer(self, size: int) -> ctypes.Array:
+        """
+        Allocate a buffer that reads from the disk can be made into.
+
+        The disk is opened without buffering, which needs buffers aligned to the sector size.
+        VirtualAlloc returns page aligned memory, which satisfies that for any sector size.
+        The buffer must be released with free_buffer.
+
+        :param int size: The size of the buffer in bytes.
+        :return: A ctypes char array over the allocated memory.
+        :rtype: ctypes.Array
+        :raises ctypes.WinError: If the memory cannot be allocated.
+        """
+        MEM_COMMIT_RESERVE: int = 0x00001000 | 0x00002000
+        PAGE_READWRITE: int = 0x04
+
+        address: int | None = VirtualAlloc(None, size, MEM_COMMIT_RESERVE, PAGE_READWRITE)
+
+        if not address:
             raise ctypes.WinError(ctypes.get_last_error())
 
-        self.cluster_size = bytes_per_sector.value * sectors_per_cluster.value
-        self.sectors_per_cluster = sectors_per_cluster.value
+        return (ctypes.c_char * size).from_address(address)
+
+    def free_buffer(self, buffer: ctypes.Array) -> None:
+        """
+        Release a buffer allocated with allocate_buffer.
+
+        :param ctypes.Array buffer: The buffer to release, it must not be used afterwards.
+        :raises ctypes.WinError: If the memory cannot be released.
+        """
+        MEM_RELEASE: int = 0x00008000
+
+        if not VirtualFree(ctypes.addressof(buffer), 0, MEM_RELEASE):
+            raise ctypes.WinError(ctypes.get_last_error())
 
     def read_clusters(self, cluster: int, clusters: int) -> bytes:
         """
-        Read a number of clusters from the disk.
+        Read a number of clusters from the disk into a new buffer.
+
+        Callers that read repeatedly should use read_clusters_into with a buffer they reuse instead.
 
         :param int cluster: The starting cluster to read from.
         :param int clusters: The number of clusters to read.
         :return: The data read from the disk.
         :rtype: bytes
-        :raises ValueError: If the number of clusters is less than or equal to 0.
-        :raises ValueError: If the cluster is less than 0 or greater than the cluster count.
-        :raises ValueError: If the number of sectors is less than or equal to 0.
-        :raises ValueError: If the sector is less than 0 or greater than the sector count.
-        :raises ValueError: If the buffer is too small to hold the data.
+        :raises ValueError: If the range is invalid, see read_clusters_into.
+        :raises ctypes.WinError: If the read operation fails.
+        """
+        # ReadFile writes into the buffer, so it has to be a mutable aligned buffer and not bytes
+        buffer: ctypes.Array[ctypes.c_char] = self.allocate_buffer(self.cluster_size * clusters)
+
+        try:
+            bytes_read: int = self.read_clusters_into(buffer, cluster, clusters)
+
+            return bytes(memoryview(buffer)[:bytes_read])
+        finally:
+            self.free_buffer(buffer)
+
+    def read_clusters_into(self, buffer: ctypes.Array, cluster: int, clusters: int) -> int:
+        """
+        Read a number of clusters from the disk into a caller supplied buffer, waiting for the read to complete.
+
+        The buffer can be reused across calls, which avoids allocating a new buffer for every read.
+
+        :param ctypes.Array buffer: A buffer from allocate_buffer large enough to hold the clusters.
+        :param int cluster: The starting cluster to read from.
+        :param int clusters: The number of clusters to read.
+        :return: The number of bytes read into the buffer.
+        :rtype: int
+        :raises ValueError: If the range is invalid, see submit_read.
+        :raises ValueError: If fewer bytes than requested were read.
         :raises ctypes.WinError: If the read operation fails.
         """
         expected_length: int = self.cluster_size * clusters
-        data: bytes = bytes(expected_length)
-        sector: int = cluster * self.sectors_per_cluster
-        sectors: int = clusters * self.sectors_per_cluster
 
-        # Some sanity checks
-        if clusters <= 0:
-            raise ValueError("Number of clusters must be greater than 0")
+        # Without an event, GetOverlappedResult waits on the disk handle itself
+        overlapped: Overlapped = Overlapped()
 
-        if cluster < 0 or cluster + clusters > self.cluster_count:
-            raise ValueError("Invalid cluster range, out of bounds")
+        self.submit_read(buffer, overlapped, cluster, clusters)
+        bytes_read: int = self.wait_read(overlapped)
 
-        if sectors <= 0:
-            raise ValueError("Number of sectors must be greater than 0")
+        # Make sure length read is expected
+        if bytes_read != expected_length:
+            raise ValueError(f"Expected {expected_length} bytes, but got {bytes_read} bytes")
 
-        if sector < 0 or sector + sectors > self.sector_count:
-            raise ValueError("Invalid sector range, out of bounds")
+        return bytes_read
 
-        if len(data) < sectors * self.sector_size:
-            raise ValueError("Buffer is too small to hold the data")
+    def submit_read(self, buffer: ctypes.Array, overlapped: Overlapped, cluster: int, clusters: int) -> None:
+        """
+        Start an overlapped read of a number of clusters from the disk into a caller supplied buffer.
 
-        # Calculate the offset in bytes
-        offset_bytes: int = sector * self.sector_size
+        The read is positioned by the offset in the OVERLAPPED structure, so no seek is needed.
+        Neither the buffer nor the OVERLAPPED structure may be reused until wait_read or cancel_read
+        has been called for it.
 
-        # Move the current position to the offset
-        if self.current_position != offset_bytes:
-            # Move the current position to the offset
-            if not SetFilePointer(self.handle, offset_bytes, None, 0):
-                raise ctypes.WinError(ctypes.get_last_error())
+        :param ctypes.Array buffer: A buffer from allocate_buffer large enough to hold the clusters.
+        :param Overlapped overlapped: The OVERLAPPED structure to track the read with.
+        :param int cluster: The starting cluster to read from.
+        :param int clusters: The number of clusters to read.
+        :raises ValueError: If the number of clusters is less than or equal to 0, or the range is out of bounds.
+        :raises ValueError: If the buffer is too small to hold the data or not aligned to the sector size.
+        :raises ctypes.WinError: If the read could not be started.
+        """
+        # Read the disk information once, this runs for every chunk
+        cluster_size: int = self.cluster_size
+        length: int = cluster_size * clusters
 
-            # Update the current position
-            self.current_position = offset_bytes
+        # Some sanity checks. The sector range follows from the cluster range, as clusters are whole sectors.
+        if clusters <= 0 or cluster < 0 or cluster + clusters > self.cluster_count:
+            raise ValueError("Invalid cluster range, must be at least one cluster and within bounds")
 
-        # Read the data from the disk
-        bytes_read: wintypes.DWORD = wintypes.DWORD()
+        if len(buffer) < length or ctypes.addressof(buffer) % self.sector_size:
+            raise ValueError("Buffer must be large enough to hold the data and aligned to the sector size")
 
-        if not ReadFile(self.handle, ctypes.byref(data), self.cluster_size * clusters, ctypes.byref(bytes_read), None):
-            raise ctypes.WinError(ctypes.get_last_error())
+        # Start the read at the offset in bytes, the OVERLAPPED structure carries all 64 bits of it
+        self._submit(ReadFile, buffer, overlapped, cluster * cluster_size, length)
 
-        # Make sure length read is expected
-        if bytes_read.value != expected_length:
-            raise ValueError(f"Expected {expected_length} bytes, but got {bytes_read.value} bytes")
+    def wait_read(self, overlapped: Overlapped) -> int:
+        """
+        Wait for a read started with submit_read to complete.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the read was started with.
+        :return: The number of bytes read.
+        :rtype: int
+        :raises ctypes.WinError: If the read operation fails.
+        """
+        return self._wait(overlapped)
+
+    def cancel_read(self, overlapped: Overlapped) -> None:
+        """
+        Cancel a read started with submit_read and wait for it to finish.
 
-        return data
+        Once this returns the buffer and the OVERLAPPED structure are safe to reuse or free.
+        Any error from the cancelled read is ignored.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the read was started with.
+        """
+        self._cancel(overlapped)
 
     def get_retrieval_pointers(self, file_handle: wintypes.HANDLE) -> list[FileExtent]:
         """
         Get the retrieval pointers for the disk.
 
         The retrieval pointers are used to find the location of the data on the disk.
+        Runs that are contiguous on disk are merged into a single extent.
 
         :param wintypes.HANDLE file_handle: The handle to the file to get the retrieval pointers for.
         :return: A list of file extents.
         :rtype: list[FileExtent]
         :raises ctypes.WinError: If the retrieval pointers cannot be obtained.
         """
+        return list(self.get_retrieval_pointers_iter(file_handle))
+
+    def get_retrieval_pointers_iter(self, file_handle: wintypes.HANDLE) -> Iterator[FileExtent]:
+        """
+        Get the retrieval pointers for the disk, one extent at a time.
+
+        The retrieval pointers are fetched in batches, starting each batch at the VCN where the previous
+        one ended, so a caller can start reading the first extents before the rest have been fetched.
+        Runs that are contiguous on disk are merged into a single extent, also across batches.
+
+        :param wintypes.HANDLE file_handle: The handle to the file to get the retrieval pointers for.
+        :return: An iterator of file extents.
+        :rtype: Iterator[FileExtent]
+        :raises ctypes.WinError: If the retrieval pointers cannot be obtained.
+        """
         input_buffer: StartingVcnInputBuffer = StartingVcnInputBuffer(StartingVcn=0)
         input_size: int = ctypes.sizeof(input_buffer)
-        chunk_size: int = 1024
+        output_buffer_size: int = 65536
         fsctl_get_ptrs: int = 0x00090073
 
-        # Loop until we get the last error that isn't 234 (ERROR_MORE_DATA)
+        # The last extent seen as (next VCN, LCN, size), held back until we know the next run is not
+        # contiguous with it. Kept as plain ints so only merged extents become FileExtent objects.
+        pending_vcn: int = 0
+        pending_lcn: int = 0
+        pending_size: int = 0
+
+        # Create a buffer to hold the retrieval pointers. It is reused for every batch, as the runs of a
+        # batch are copied out of it into lists before the next one is fetched.
+        output_buffer: ctypes.Array[ctypes.c_char] = ctypes.create_string_buffer(output_buffer_size)
+        bytes_returned: wintypes.DWORD = wintypes.DWORD(0)
+
+        # Loop until a batch returns all the remaining runs, 234 (ERROR_MORE_DATA) means there are more
         while True:
-            # Create a buffer to hold the retrieval pointers
-            output_buffer: ctypes.Array[ctypes.c_char] = ctypes.create_string_buffer(chunk_size)
-            bytes_returned: wintypes.DWORD = wintypes.DWORD(0)
+            more_data: bool = False
 
             # Call DeviceIoControl to get the retrieval pointers.
-            # We can check if it succeeds and then break out of the loop.
-            if DeviceIoControl(
+            # On ERROR_MORE_DATA the buffer still holds as many runs as fit in it.
+            if not DeviceIoControl(
                 file_handle,
                 fsctl_get_ptrs,
                 ctypes.byref(input_buffer),
                 input_size,
                 output_buffer,
-                chunk_size,
+                output_buffer_size,
                 ctypes.byref(bytes_returned),
                 None,
             ):
-                break
+                last_error: int = ctypes.get_last_error()
+
+                # There are no runs past the starting VCN
+                if last_error == 38:  # ERROR_HANDLE_EOF
+                    break
+
+                if last_error != 234:  # ERROR_MORE_DATA
+                    raise ctypes.WinError(last_error)
 
-            last_error: int = ctypes.get_last_error()
+                more_data = True
 
-            # Increase the buffer size as we have more data
-            if last_error == 234:  # ERROR_MORE_DATA
-                output_buffer_size = max(output_buffer_size * 2, bytes_returned.value)
-                continue
+            # Cast data to structure, then view its trailing extents as one flat array of integers.
+            # Each extent is a (NextVcn, Lcn) pair, so slicing the array splits it into one list per column
+            # in C, and no ctypes object is made per extent.
+            pointers: RetrievalPointersBuffer = RetrievalPointersBuffer.from_buffer(output_buffer)
+            fields: int = len(RetrievalPointerExtent._fields_)
+            runs: ctypes.Array[wintypes.ULARGE_INTEGER] = (
+                wintypes.ULARGE_INTEGER * (pointers.ExtentCount * fields)
+            ).from_buffer(output_buffer, RetrievalPointersBuffer.Extents.offset)
+            next_vcns: list[int] = runs[0::fields]
+            lcns: list[int] = runs[1::fields]
 
-            raise ctypes.WinError(last_error)
+            # Each run ends at NextVcn and starts where the previous one ended, both in clusters
+            start_vcn: int = pointers.StartingVcn
 
-        # Cast data to structure
-        pointers: RetrievalPointersBuffer = ctypes.cast(output_buffer, ctypes.POINTER(RetrievalPointersBuffer)).contents
-        extents: list[FileExtent] = []
+            for next_vcn, lcn in zip(next_vcns, lcns):
+                size: int = next_vcn - start_vcn
+                start_vcn = next_vcn
 
-        for i in range(pointers.ExtentCount):
-            extent: RetrievalPointerExtent = ctypes.cast(
-                ctypes.byref(pointers.Extents, i * ctypes.sizeof(RetrievalPointerExtent)),
-                ctypes.POINTER(RetrievalPointerExtent),
-            ).contents
+                # Merge runs that are contiguous on disk, so they can be read with fewer, larger reads.
+                # Extent sizes are in clusters, the same unit as the LCN.
+                if pending_size and pending_lcn + pending_size == lcn:
+                    pending_vcn = next_vcn
+                    pending_size += size
+                    continue
+
+                if pending_size:
+                    yield FileExtent(vcn=pending_vcn, lcn=pending_lcn, size=pending_size)
+
+                pending_vcn, pending_lcn, pending_size = next_vcn, lcn, size
+
+            if not more_data:
+                break
 
-            start_vcn: int = pointers.StartingVcn.value if i == 0 else pointers.Extents[i - 1].NextVcn.value
+            # A batch with more to come but no runs in it would fetch the same batch forever
+            if not pointers.ExtentCount:
+                raise ValueError("Retrieval pointers buffer is too small to hold a single run")
 
-            extents.append(
-                FileExtent(vcn=extent.NextVcn.value, lcn=extent.Lcn.value, size=extent.NextVcn.value - start_vcn)
-            )
+            # Carry on from where this batch ended
+            input_buffer.StartingVcn = start_vcn
 
-        return extents
+        if pending_size:
+            yield FileExtent(vcn=pending_vcn, lcn=pending_lcn, size=pending_size)
@@ -0,0 +1,71 @@
+import ctypes
+from collections.abc import Callable
+from ctypes import wintypes
+from typing import Any
+
+from shims import GetOverlappedResult, CancelIoEx
+from models import Overlapped
+
+# Returned by ReadFile and WriteFile when an overlapped request has been queued but not completed yet
+ERROR_IO_PENDING: int = 997
+
+
+class OverlappedHandle:
+    """
+    Overlapped I/O on a Win32 handle opened with FILE_FLAG_OVERLAPPED.
+
+    Subclasses set self.handle, and expose the request methods under names that fit what they wrap.
+    """
+
+    def __init__(self):
+        # Win32 handle the requests are made on
+        self.handle: wintypes.HANDLE
+
+        # Receives the byte count of completed requests, reused so waiting does not make ctypes objects
+        self._transferred: wintypes.DWORD = wintypes.DWORD()
+        self._transferred_ref: Any = ctypes.byref(self._transferred)
+
+    def _submit(
+        self, function: Callable[..., int], buffer: ctypes.Array, overlapped: Overlapped, offset: int, length: int
+    ) -> None:
+        """
+        Start an overlapped request positioned by the offset in the OVERLAPPED structure.
+
+        :param Callable[..., int] function: ReadFile or WriteFile.
+        :param ctypes.Array buffer: The buffer to read into or write from.
+        :param Overlapped overlapped: The OVERLAPPED structure to track the request with.
+        :param int offset: The byte offset of the request.
+        :param int length: The number of bytes to transfer.
+        :raises ctypes.WinError: If the request could not be started.
+        """
+        overlapped.offset = offset
+
+        # It is fine for the request to still be pending
+        if not function(self.handle, buffer, length, None, ctypes.byref(overlapped)):
+            last_error: int = ctypes.get_last_error()
+
+            if last_error != ERROR_IO_PENDING:
+                raise ctypes.WinError(last_error)
+
+    def _wait(self, overlapped: Overlapped) -> int:
+        """
+        Wait for a request started with _submit to complete.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the request was started with.
+        :return: The number of bytes transferred.
+        :rtype: int
+        :raises ctypes.WinError: If the request failed.
+        """
+        if not GetOverlappedResult(self.handle, ctypes.byref(overlapped), self._transferred_ref, True):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+        return self._transferred.value
+
+    def _cancel(self, overlapped: Overlapped) -> None:
+        """
+        Cancel a request started with _submit and wait for it to finish, ignoring any error from it.
+
+        :param Overlapped overlapped: The OVERLAPPED structure the request was started with.
+        """
+        CancelIoEx(self.handle, ctypes.byref(overlapped))
+        GetOverlappedResult(self.handle, ctypes.byref(overlapped), self._transferred_ref, True)
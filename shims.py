@@ -1,10 +1,14 @@
 import ctypes
 from ctypes import wintypes
 
+# kernel32 loaded with use_last_error, so ctypes.get_last_error() returns the error of the last call.
+# ctypes.windll does not do this, and the overlapped I/O paths need to tell ERROR_IO_PENDING apart from failures.
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
 # CreateFileW - https://learn.microsoft.com/en-us/windows/win32/api/file/nf-file-createfilew
 # Arguments: lpFileName, dwDesiredAccess, dwShareMode, lpSecurityAttributes, dwCreationDisposition, dwFlagsAndAttributes, hTemplateFile
 # Return: HANDLE
-CreateFile = ctypes.windll.kernel32.CreateFileW
+CreateFile = kernel32.CreateFileW
 CreateFile.argtypes = [
     wintypes.LPCWSTR,
     wintypes.DWORD,
@@ -16,10 +20,13 @@ CreateFile.argtypes = [
 ]
 CreateFile.restype = wintypes.HANDLE
 
-# GetFreeDiskSpaceA - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-getdiskfreespaceA
+# INVALID_HANDLE_VALUE, what CreateFile returns on failure. HANDLE is unsigned, so this is not -1.
+INVALID_HANDLE_VALUE: int = wintypes.HANDLE(-1).value
+
+# GetDiskFreeSpaceW - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-getdiskfreespacew
 # Arguments: lpRootPathName, lpSectorsPerCluster, lpBytesPerSector, lpNumberOfFreeClusters, lpTotalNumberOfClusters
 # Return: BOOL
-GetFreeDiskSpace = ctypes.windll.kernel32.GetDiskFreeSpaceA
+GetFreeDiskSpace = kernel32.GetDiskFreeSpaceW
 GetFreeDiskSpace.argtypes = [
     wintypes.LPCWSTR,
     ctypes.POINTER(wintypes.DWORD),
@@ -29,11 +36,18 @@ GetFreeDiskSpace.argtypes = [
 ]
 GetFreeDiskSpace.restype = wintypes.BOOL
 
+# GetVolumePathNameW - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-getvolumepathnamew
+# Arguments: lpszFileName, lpszVolumePathName, cchBufferLength
+# Return: BOOL
+GetVolumePathName = kernel32.GetVolumePathNameW
+GetVolumePathName.argtypes = [wintypes.LPCWSTR, wintypes.LPWSTR, wintypes.DWORD]
+GetVolumePathName.restype = wintypes.BOOL
+
 
 # DeviceIoControl - https://learn.microsoft.com/en-us/windows/win32/api/ioapiset/nf-ioapiset-deviceiocontrol
 # Arguments: hDevice, dwIoControlCode, lpInBuffer, nInBufferSize, lpOutBuffer, nOutBufferSize, lpBytesReturned, lpOverlapped
 # Return: BOOL
-DeviceIoControl = ctypes.windll.kernel32.DeviceIoControl
+DeviceIoControl = kernel32.DeviceIoControl
 DeviceIoControl.argtypes = [
     wintypes.HANDLE,
     wintypes.DWORD,
@@ -49,32 +63,112 @@ DeviceIoControl.restype = wintypes.BOOL
 # CloseHandle - https://learn.microsoft.com/en-us/windows/win32/api/processthreadsapi/nf-processthreadsapi-closehandle
 # Arguments: hObject
 # Return: BOOL
-CloseHandle = ctypes.windll.kernel32.CloseHandle
+CloseHandle = kernel32.CloseHandle
 CloseHandle.argtypes = [wintypes.HANDLE]
 CloseHandle.restype = wintypes.BOOL
 
-# SetFilePointer - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-setfilepointer
-# Arguments: hFile, lDistanceToMove, lpDistanceToMoveHigh, dwMoveMethod
-# Return: DWORD
-SetFilePointer = ctypes.windll.kernel32.SetFilePointer
-SetFilePointer.argtypes = [
+# ReadFile - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-readfile
+# Arguments: hFile, lpBuffer, nNumberOfBytesToRead, lpNumberOfBytesRead, lpOverlapped
+# Return: BOOL
+ReadFile = kernel32.ReadFile
+ReadFile.argtypes = [
     wintypes.HANDLE,
-    ctypes.c_long,
-    ctypes.POINTER(ctypes.c_long),
+    ctypes.c_void_p,
     wintypes.DWORD,
+    ctypes.POINTER(wintypes.DWORD),
+    ctypes.c_void_p,
 ]
-SetFilePointer.restype = wintypes.DWORD
+ReadFile.restype = wintypes.BOOL
 
+# GetOverlappedResult - https://learn.microsoft.com/en-us/windows/win32/api/ioapiset/nf-ioapiset-getoverlappedresult
+# Arguments: hFile, lpOverlapped, lpNumberOfBytesTransferred, bWait
+# Return: BOOL
+GetOverlappedResult = kernel32.GetOverlappedResult
+GetOverlappedResult.argtypes = [
+    wintypes.HANDLE,
+    ctypes.c_void_p,
+    ctypes.POINTER(wintypes.DWORD),
+    wintypes.BOOL,
+]
+GetOverlappedResult.restype = wintypes.BOOL
 
-# ReadFile - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-readfile
-# Arguments: hFile, lpBuffer, nNumberOfBytesToRead, lpNumberOfBytesRead, lpOverlapped
+# CancelIoEx - https://learn.microsoft.com/en-us/windows/win32/fileio/cancelioex-func
+# Arguments: hFile, lpOverlapped
 # Return: BOOL
-ReadFile = ctypes.windll.kernel32.ReadFile
-ReadFile.argtypes = [
+CancelIoEx = kernel32.CancelIoEx
+CancelIoEx.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+CancelIoEx.restype = wintypes.BOOL
+
+# CreateEventW - https://learn.microsoft.com/en-us/windows/win32/api/synchapi/nf-synchapi-createeventw
+# Arguments: lpEventAttributes, bManualReset, bInitialState, lpName
+# Return: HANDLE
+CreateEvent = kernel32.CreateEventW
+CreateEvent.argtypes = [
+    wintypes.LPVOID,
+    wintypes.BOOL,
+    wintypes.BOOL,
+    wintypes.LPCWSTR,
+]
+CreateEvent.restype = wintypes.HANDLE
+
+# WriteFile - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-writefile
+# Arguments: hFile, lpBuffer, nNumberOfBytesToWrite, lpNumberOfBytesWritten, lpOverlapped
+# Return: BOOL
+WriteFile = kernel32.WriteFile
+WriteFile.argtypes = [
     wintypes.HANDLE,
     ctypes.c_void_p,
     wintypes.DWORD,
     ctypes.POINTER(wintypes.DWORD),
     ctypes.c_void_p,
 ]
-ReadFile.restype = wintypes.BOOL
+WriteFile.restype = wintypes.BOOL
+
+# VirtualAlloc - https://learn.microsoft.com/en-us/windows/win32/api/memoryapi/nf-memoryapi-virtualalloc
+# Arguments: lpAddress, dwSize, flAllocationType, flProtect
+# Return: LPVOID
+VirtualAlloc = kernel32.VirtualAlloc
+VirtualAlloc.argtypes = [
+    wintypes.LPVOID,
+    ctypes.c_size_t,
+    wintypes.DWORD,
+    wintypes.DWORD,
+]
+VirtualAlloc.restype = wintypes.LPVOID
+
+# VirtualFree - https://learn.microsoft.com/en-us/windows/win32/api/memoryapi/nf-memoryapi-virtualfree
+# Arguments: lpAddress, dwSize, dwFreeType
+# Return: BOOL
+VirtualFree = kernel32.VirtualFree
+VirtualFree.argtypes = [
+    wintypes.LPVOID,
+    ctypes.c_size_t,
+    wintypes.DWORD,
+]
+VirtualFree.restype = wintypes.BOOL
+
+# GetFileSizeEx - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-getfilesizeex
+# Arguments: hFile, lpFileSize
+# Return: BOOL
+GetFileSizeEx = kernel32.GetFileSizeEx
+GetFileSizeEx.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.LARGE_INTEGER)]
+GetFileSizeEx.restype = wintypes.BOOL
+
+# SetFilePointerEx - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-setfilepointerex
+# Arguments: hFile, liDistanceToMove, lpNewFilePointer, dwMoveMethod
+# Return: BOOL
+SetFilePointerEx = kernel32.SetFilePointerEx
+SetFilePointerEx.argtypes = [
+    wintypes.HANDLE,
+    wintypes.LARGE_INTEGER,
+    ctypes.POINTER(wintypes.LARGE_INTEGER),
+    wintypes.DWORD,
+]
+SetFilePointerEx.restype = wintypes.BOOL
+
+# SetEndOfFile - https://learn.microsoft.com/en-us/windows/win32/api/fileapi/nf-fileapi-setendoffile
+# Arguments: hFile
+# Return: BOOL
+SetEndOfFile = kernel32.SetEndOfFile
+SetEndOfFile.argtypes = [wintypes.HANDLE]
+SetEndOfFile.restype = wintypes.BOOL
@@ -0,0 +1,50 @@
+import ctypes
+import os
+from ctypes import wintypes
+
+from shims import GetFreeDiskSpace, GetVolumePathName
+
+
+def get_volume_root(file_path: str) -> str:
+    """
+    Get the root of the volume a file is on, which is a mounted folder rather than a drive if it is mounted in one.
+
+    :param str file_path: The path of the file, which does not need to exist yet.
+    :return: The root of the volume, with a trailing backslash.
+    :rtype: str
+    :raises ctypes.WinError: If the root cannot be obtained.
+    """
+    full_path: str = os.path.abspath(file_path)
+
+    # The root is never longer than the path it is part of, plus the trailing backslash
+    volume_root: ctypes.Array = ctypes.create_unicode_buffer(max(len(full_path) + 2, 261))
+
+    if not GetVolumePathName(full_path, volume_root, len(volume_root)):
+        raise ctypes.WinError(ctypes.get_last_error())
+
+    return volume_root.value
+
+
+def get_cluster_geometry(root_path: str) -> tuple[int, int]:
+    """
+    Get the number of sectors per cluster and bytes per sector of a volume.
+
+    :param str root_path: The root of the volume, with a trailing backslash.
+    :return: The number of sectors per cluster and the number of bytes per sector.
+    :rtype: tuple[int, int]
+    :raises ctypes.WinError: If the information cannot be obtained.
+    """
+    sectors_per_cluster: wintypes.DWORD = wintypes.DWORD()
+    bytes_per_sector: wintypes.DWORD = wintypes.DWORD()
+
+    # Get the cluster geometry and raise an error if it fails
+    if not GetFreeDiskSpace(
+        root_path,
+        ctypes.byref(sectors_per_cluster),
+        ctypes.byref(bytes_per_sector),
+        wintypes.DWORD(),
+        wintypes.DWORD(),
+    ):
+        raise ctypes.WinError(ctypes.get_last_error())
+
+    return sectors_per_cluster.value, bytes_per_sector.value